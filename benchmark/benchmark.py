@@ -24,8 +24,8 @@ from config import (
     MATRIX_PROFILES,
 )
 from generator import generate_dataset, parse_size
-from plotting import plot_matrix_results, print_matrix_summary, save_matrix_results
-from runner import run_matrix_benchmark
+from plotting import plot_matrix_results, print_matrix_summary
+from runner import run_matrix_benchmark, tmpfs_dir
 
 
 def cmd_run(args):
@@ -36,12 +36,28 @@ def cmd_run(args):
     print(f"Dataset size per combination: {args.size}")
     print(f"Runs per tool: {args.runs}")
 
-    matrix_results = run_matrix_benchmark(total_size, args.runs)
+    tmp_dir = None
+    if args.tmpfs:
+        tmp_dir = tmpfs_dir(total_size)
+        if tmp_dir is None:
+            print("Warning: /dev/shm is unavailable or too small, using default temp dir")
+        else:
+            print(f"Datasets in tmpfs: {tmp_dir}")
+
+    results_dir = Path(args.results)
+    results_path = results_dir / "matrix_benchmark.jsonl"
+    matrix_results = run_matrix_benchmark(
+        total_size,
+        args.runs,
+        tmp_dir=tmp_dir,
+        pipeline=args.pipeline,
+        results_path=results_path,
+        hash_workers=args.workers,
+    )
 
     print_matrix_summary(matrix_results)
 
-    results_dir = Path(args.results)
-    save_matrix_results(matrix_results, results_dir / "matrix_benchmark.json")
+    print(f"Saved matrix results to {results_path}")
     plot_matrix_results(matrix_results, results_dir)
 
 
@@ -61,6 +77,7 @@ def cmd_generate(args):
         total_size=total_size,
         dup_ratio=args.dup_ratio,
         profile_name=args.profile,
+        workers=args.workers,
     )
 
     print("\nDataset generated:")
@@ -88,6 +105,23 @@ def main():
     run_parser.add_argument(
         "--results", default=str(DEFAULT_RESULTS_DIR), help="Results directory"
     )
+    run_parser.add_argument(
+        "--tmpfs",
+        action="store_true",
+        help="Generate datasets in /dev/shm so tools scan memory instead of disk",
+    )
+    run_parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Generate the next dataset while tools run (best combined with --tmpfs)",
+    )
+    run_parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        help="Processes used by the Python hash baselines (defaults to number of "
+        "CPU cores, use 1 on HDDs)",
+    )
 
     # Generate subcommand
     gen_parser = subparsers.add_parser(
@@ -117,6 +151,13 @@ def main():
         default=0.30,
         help="Duplicate ratio (0.10, 0.30, or 0.60)",
     )
+    gen_parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=None,
+        help="Processes used to write files (defaults to number of CPU cores)",
+    )
 
     args = parser.parse_args()
 
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import bisect
+import errno
+import fcntl
 import hashlib
+import itertools
 import json
-import random
+import mmap
+import multiprocessing
+import os
 import shutil
-from collections import Counter
+from array import array
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 from tqdm import tqdm
 
 from config import SIZE_PROFILES, SIZE_RANGES
@@ -21,29 +30,191 @@ def parse_size(size_str: str) -> int:
     return int(size_str)
 
 
-def generate_content(seed: int, size: int) -> bytes:
-    """Generate deterministic content based on seed."""
+MAX_FILE_SIZE = max(max_size for _, max_size in SIZE_RANGES.values())
+
+# Below this size, building the tiled content as bytes beats filling in place
+SMALL_FILL_SIZE = 64 * 1024
+
+# Upper bounds on the work handed to a generator worker in one go
+CHUNK_FILES = 1024
+CHUNK_BYTES = 64 * 1024**2
+
+# Files larger than this are written with O_DIRECT to keep them out of the page cache
+DIRECT_IO_MIN_SIZE = 4 * 1024**2
+DIRECT_IO_ALIGN = 4096
+DIRECT_IO_CHUNK = 1024**2
+
+# Number of files' worth of random draws generated at once
+RNG_BATCH = 4096
+
+# Dataset plans are stored column-wise: (file index, seed or source file index, size)
+Plan = tuple[array, array, array]
+
+
+def fill_buffer(buf: memoryview, seed: int) -> None:
+    """Fill buf in place with deterministic content based on seed."""
     h = hashlib.sha256(seed.to_bytes(8, "little")).digest()
-    repeats = (size // len(h)) + 1
-    return (h * repeats)[:size]
-
-
-def pick_size(profile: dict[str, float], rng_seed: int) -> int:
-    """Pick a file size based on profile distribution using cumulative weighted random choice."""
-    rng = random.Random(rng_seed)
-    r = rng.random()
-    cumulative = 0.0
-    category = None
-    for cat, weight in profile.items():
-        cumulative += weight
-        if r < cumulative:
-            category = cat
-            break
-
-    if category is None:
+    size = len(buf)
+    if size <= SMALL_FILL_SIZE:
+        buf[:] = (h * (size // len(h) + 1))[:size]
+        return
+
+    # Tile by doubling the filled prefix so each step is a single memcpy
+    buf[: len(h)] = h
+    filled = len(h)
+    while filled < size:
+        n = min(filled, size - filled)
+        buf[filled : filled + n] = buf[:n]
+        filled += n
+
+
+def write_file(path: Path, data: memoryview) -> None:
+    """Write data to path without going through a Python file object."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data) :]
+    finally:
+        os.close(fd)
+
+
+def pick_size(
+    categories: list[str],
+    cum_weights: list[float],
+    category_draw: float,
+    size_draw: float,
+) -> int:
+    """Pick a file size from two uniform [0, 1) draws using cumulative category weights."""
+    idx = bisect.bisect(cum_weights, category_draw)
+    if idx == len(categories):
         raise ValueError("Failed to pick size category")
-    min_size, max_size = SIZE_RANGES[category]
-    return rng.randint(min_size, max_size)
+    min_size, max_size = SIZE_RANGES[categories[idx]]
+    return min_size + int(size_draw * (max_size - min_size + 1))
+
+
+def _random_draws(rng: np.random.Generator) -> Iterator[tuple[list[float], int]]:
+    """Yield three uniform draws and a seed per file, generated in vectorized batches."""
+    while True:
+        draws = rng.random((RNG_BATCH, 3)).tolist()
+        seeds = rng.integers(0, 2**32, RNG_BATCH, endpoint=True).tolist()
+        yield from zip(draws, seeds)
+
+
+def write_file_direct(path: Path, data: memoryview) -> None:
+    """Write page-aligned data to path, bypassing the page cache where supported."""
+    if not hasattr(os, "O_DIRECT"):
+        write_file(path, data)
+        return
+    try:
+        _write_direct(path, data)
+    except OSError as e:
+        # Some filesystems, e.g. tmpfs on older kernels, reject O_DIRECT
+        if e.errno != errno.EINVAL:
+            raise
+        write_file(path, data)
+
+
+def _write_direct(path: Path, data: memoryview) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+    try:
+        aligned = len(data) - len(data) % DIRECT_IO_ALIGN
+        offset = 0
+        while offset < aligned:
+            end = min(offset + DIRECT_IO_CHUNK, aligned)
+            offset += os.write(fd, data[offset:end])
+        if offset < len(data):
+            # O_DIRECT writes must be whole blocks, the tail goes through the cache
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+            while offset < len(data):
+                offset += os.write(fd, data[offset:])
+    finally:
+        os.close(fd)
+
+
+def copy_file(src: Path, dst: Path, size: int) -> None:
+    """Copy src to dst inside the kernel, sharing extents where the filesystem can."""
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(src, dst)
+        return
+
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            copied = 0
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if n == 0:
+                    break
+                copied += n
+        finally:
+            os.close(dst_fd)
+    except OSError:
+        # Not every filesystem supports copy_file_range
+        shutil.copyfile(src, dst)
+    finally:
+        os.close(src_fd)
+
+
+def _file_dir(output_dir: Path, idx: int) -> Path:
+    """Directory holding the file with the given index."""
+    return output_dir / f"{idx % 256:02x}" / f"{(idx // 256) % 256:02x}"
+
+
+def _file_path(output_dir: Path, idx: int) -> Path:
+    """Path of the file with the given index."""
+    return _file_dir(output_dir, idx) / f"file_{idx:06d}.bin"
+
+
+def _write_files(output_dir: Path, plan: Plan) -> int:
+    """Write unique files from a slice of the dataset plan. Runs in a worker process."""
+    # Anonymous mmaps are page-aligned, as O_DIRECT requires
+    buf = memoryview(mmap.mmap(-1, MAX_FILE_SIZE))
+    bytes_written = 0
+    for idx, seed, size in zip(*plan):
+        content = buf[:size]
+        fill_buffer(content, seed)
+        if size > DIRECT_IO_MIN_SIZE:
+            write_file_direct(_file_path(output_dir, idx), content)
+        else:
+            write_file(_file_path(output_dir, idx), content)
+        bytes_written += size
+    return bytes_written
+
+
+def _copy_files(output_dir: Path, plan: Plan) -> int:
+    """Copy duplicate files from their sources. Runs in a worker process."""
+    bytes_written = 0
+    for idx, src_idx, size in zip(*plan):
+        copy_file(_file_path(output_dir, src_idx), _file_path(output_dir, idx), size)
+        bytes_written += size
+    return bytes_written
+
+
+def _chunk_plan(plan: Plan) -> list[Plan]:
+    """Split the plan into slices small enough to keep the progress bar moving."""
+    chunks = []
+    start = 0
+    chunk_bytes = 0
+    for end, size in enumerate(plan[2], start=1):
+        chunk_bytes += size
+        if end - start >= CHUNK_FILES or chunk_bytes >= CHUNK_BYTES:
+            chunks.append(_slice_plan(plan, start, end))
+            start = end
+            chunk_bytes = 0
+    if start < len(plan[2]):
+        chunks.append(_slice_plan(plan, start, len(plan[2])))
+    return chunks
+
+
+def _slice_plan(plan: Plan, start: int, end: int) -> Plan:
+    first, second, sizes = plan
+    return first[start:end], second[start:end], sizes[start:end]
+
+
+def _new_plan() -> Plan:
+    return array("q"), array("q"), array("q")
 
 
 def generate_dataset(
@@ -51,10 +222,14 @@ def generate_dataset(
     total_size: int,
     dup_ratio: float,
     profile_name: str,
+    workers: int | None = None,
+    progress: bool = True,
 ) -> dict:
     """Generate test dataset with specified parameters."""
     profile = SIZE_PROFILES[profile_name]
-    rng = random.Random(42)
+    categories = list(profile)
+    cum_weights = list(itertools.accumulate(profile.values()))
+    draws = _random_draws(np.random.default_rng(42))
 
     if output_dir.resolve() in (Path("/").resolve(), Path.home().resolve()):
         raise ValueError("Output directory is too dangerous to delete")
@@ -63,48 +238,75 @@ def generate_dataset(
         shutil.rmtree(output_dir)
     output_dir.mkdir(parents=True)
 
-    unique_seeds: list[tuple[int, int]] = []
-    seed_usage: Counter[int] = Counter()
+    # Plan every file up front so the writes can be spread across processes
+    # while the dataset stays identical to a sequential run. Unique files are
+    # written first, duplicates are then copied from the first file that used
+    # the same seed. The plan and the per-unique-file usage counts are kept in
+    # typed arrays, a few bytes per file instead of a tuple of Python ints.
+    writes = _new_plan()
+    copies = _new_plan()
+    unique_files, unique_seeds, unique_sizes = writes
+    usage = array("q")
     files_created = 0
     bytes_written = 0
     duplicates_created = 0
 
-    with tqdm(
-        total=total_size,
-        unit="B",
-        unit_scale=True,
-        unit_divisor=1024,
-        desc="Generating test files",
-        leave=True,
-    ) as pbar:
-        while bytes_written < total_size:
-            is_duplicate = rng.random() < dup_ratio and unique_seeds
-
-            if is_duplicate:
-                seed, size = rng.choice(unique_seeds)
-                duplicates_created += 1
-            else:
-                seed = rng.randint(0, 2**32)
-                size = pick_size(profile, seed)
-                unique_seeds.append((seed, size))
-
-            seed_usage[seed] += 1
-
-            dir_a = f"{files_created % 256:02x}"
-            dir_b = f"{(files_created // 256) % 256:02x}"
-            file_dir = output_dir / dir_a / dir_b
-            file_dir.mkdir(parents=True, exist_ok=True)
-
-            file_path = file_dir / f"file_{files_created:06d}.bin"
-            content = generate_content(seed, size)
-            file_path.write_bytes(content)
-
-            bytes_written += size
-            files_created += 1
-            pbar.update(size)
-
-    files_in_dup_groups = sum(count for count in seed_usage.values() if count >= 2)
-    dup_groups = sum(1 for count in seed_usage.values() if count >= 2)
+    while bytes_written < total_size:
+        (dup_draw, pick_draw, size_draw), seed = next(draws)
+        is_duplicate = dup_draw < dup_ratio and unique_seeds
+
+        if is_duplicate:
+            unique = int(pick_draw * len(unique_seeds))
+            size = unique_sizes[unique]
+            copies[0].append(files_created)
+            copies[1].append(unique_files[unique])
+            copies[2].append(size)
+            duplicates_created += 1
+        else:
+            unique = len(unique_seeds)
+            size = pick_size(categories, cum_weights, pick_draw, size_draw)
+            unique_files.append(files_created)
+            unique_seeds.append(seed)
+            unique_sizes.append(size)
+            usage.append(0)
+
+        usage[unique] += 1
+
+        bytes_written += size
+        files_created += 1
+
+    # File directories wrap around after 256 * 256 files, so create them once
+    # here rather than checking on every write.
+    for idx in range(min(files_created, 256 * 256)):
+        _file_dir(output_dir, idx).mkdir(parents=True, exist_ok=True)
+
+    with (
+        # With --pipeline this runs in a background thread while the tools are
+        # spawned, so workers must not be forked from this multithreaded process
+        ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context("forkserver"),
+        ) as executor,
+        tqdm(
+            total=bytes_written,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+            desc="Generating test files",
+            leave=True,
+            disable=not progress,
+        ) as pbar,
+    ):
+        for worker, plan in ((_write_files, writes), (_copy_files, copies)):
+            futures = [
+                executor.submit(worker, output_dir, chunk)
+                for chunk in _chunk_plan(plan)
+            ]
+            for future in as_completed(futures):
+                pbar.update(future.result())
+
+    files_in_dup_groups = sum(count for count in usage if count >= 2)
+    dup_groups = sum(1 for count in usage if count >= 2)
 
     metadata = {
         "total_files": files_created,
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Count files in duplicate groups by hashing files in-process.
+
+Used as a baseline tool by the benchmark, prints a single number.
+
+Usage:
+    python hashcount.py md5 /path/to/dir
+    python hashcount.py blake3 /path/to/dir    # requires the blake3 package
+    python hashcount.py xxh3 /path/to/dir      # requires the xxhash package
+    python hashcount.py fastcdc /path/to/dir   # requires fastcdc and blake3
+    python hashcount.py md5 /path/to/dir -j 1  # hash on a single core, e.g. on HDDs
+    python hashcount.py md5 /path/to/dir --bloom  # two passes, less memory
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import importlib.machinery
+import importlib.util
+import itertools
+import math
+import mmap
+import os
+import sys
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+READ_SIZE = 1024**2
+
+# Files larger than this are hashed with BLAKE3's multithreaded mode, unless
+# the hashing is already spread across worker processes
+BLAKE3_THREADED_SIZE = 1024**2
+
+# FastCDC chunk size bounds
+CDC_MIN_SIZE = 8 * 1024
+CDC_AVG_SIZE = 32 * 1024
+CDC_MAX_SIZE = 64 * 1024
+
+# Number of paths handed to a hashing worker at a time, and how many such
+# chunks each worker may have queued
+CHUNK_FILES = 256
+CHUNKS_PER_WORKER = 4
+
+BLOOM_ERROR_RATE = 0.01
+
+# Hash constructors, called with the size of the file about to be hashed and
+# whether the hash may start threads of its own
+HASHES: dict[str, Callable[[int, bool], object]] = {
+    "md5": lambda size, threaded: hashlib.md5(),
+}
+if blake3 is not None:
+    HASHES["blake3"] = lambda size, threaded: blake3.blake3(
+        max_threads=(
+            blake3.blake3.AUTO if threaded and size > BLAKE3_THREADED_SIZE else 1
+        )
+    )
+if xxhash is not None:
+    HASHES["xxh3"] = lambda size, threaded: xxhash.xxh3_128()
+
+
+def _has_fastcdc_cy() -> bool:
+    """Whether fastcdc's compiled chunker is installed, without importing it."""
+    # find_spec on fastcdc.fastcdc_cy would import the package, and with it click
+    spec = importlib.util.find_spec("fastcdc")
+    return (
+        spec is not None
+        and importlib.machinery.PathFinder.find_spec(
+            "fastcdc_cy", spec.submodule_search_locations
+        )
+        is not None
+    )
+
+
+# Whole-file hashes, plus content-defined chunking hashed with BLAKE3. fastcdc
+# is only imported when used
+ALGORITHMS = list(HASHES)
+if blake3 is not None and _has_fastcdc_cy():
+    ALGORITHMS.append("fastcdc")
+
+
+def iter_entries(root: str) -> Iterator[os.DirEntry]:
+    """Yield entries of regular files under root without following symlinks."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def iter_files(root: str) -> Iterator[str]:
+    """Yield paths of regular files under root without following symlinks."""
+    return (entry.path for entry in iter_entries(root))
+
+
+def hash_file(path: str, new_hash: Callable, buf: memoryview) -> bytes:
+    """Hash a file's content, reading it into a reused buffer."""
+    with open(path, "rb", buffering=0) as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        if hasattr(os, "posix_fadvise") and size:
+            # Ask for aggressive readahead of the whole file up front
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        h = new_hash(size)
+        while n := f.readinto(buf):
+            h.update(buf[:n])
+    return h.digest()
+
+
+def hash_file_cdc(path: str, chunker: Callable) -> bytes:
+    """Hash a file's FastCDC chunks with BLAKE3 and combine the chunk digests."""
+    file_hash = blake3.blake3()
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return file_hash.digest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(data) as view:
+                for chunk in chunker(view, CDC_MIN_SIZE, CDC_AVG_SIZE, CDC_MAX_SIZE):
+                    end = chunk.offset + chunk.length
+                    file_hash.update(blake3.blake3(view[chunk.offset : end]).digest())
+    return file_hash.digest()
+
+
+def file_hasher(algorithm: str, threaded: bool) -> Callable[[str], bytes]:
+    """Return a function hashing a file's content with the given algorithm."""
+    if algorithm == "fastcdc":
+        # fastcdc announces its slow pure-Python fallback on stdout, where the
+        # count goes, so only its compiled implementation is used
+        with contextlib.redirect_stdout(sys.stderr):
+            from fastcdc.fastcdc_cy import fastcdc_cy
+        return functools.partial(hash_file_cdc, chunker=fastcdc_cy)
+    new_hash = functools.partial(HASHES[algorithm], threaded=threaded)
+    buf = memoryview(bytearray(READ_SIZE))
+    return lambda path: hash_file(path, new_hash, buf)
+
+
+class BloomFilter:
+    """Bloom filter over hash digests, which are already uniformly distributed."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(8, math.ceil(bits))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, digest: bytes) -> bool:
+        """Add a digest, returning whether it was probably present already."""
+        # Double hashing: derive every bit index from two halves of the digest
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        present = True
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                present = False
+        return present
+
+
+def _hash_chunk(algorithm: str, paths: list[str]) -> list[bytes]:
+    """Hash a chunk of files. Runs in a worker process."""
+    # The other workers already occupy the remaining cores
+    hasher = file_hasher(algorithm, threaded=False)
+    return [hasher(path) for path in paths]
+
+
+def iter_digests(
+    paths: Iterable[str], algorithm: str, workers: int
+) -> Iterator[tuple[str, bytes]]:
+    """Yield each path with its digest in order, hashing across worker processes."""
+    if workers <= 1:
+        hasher = file_hasher(algorithm, threaded=True)
+        for path in paths:
+            yield path, hasher(path)
+        return
+
+    paths = iter(paths)
+    chunks = iter(lambda: list(itertools.islice(paths, CHUNK_FILES)), [])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a bounded number of chunks is in flight, so the paths are never
+        # all held in memory at once
+        pending = deque(
+            (chunk, executor.submit(_hash_chunk, algorithm, chunk))
+            for chunk in itertools.islice(chunks, workers * CHUNKS_PER_WORKER)
+        )
+        while pending:
+            chunk, future = pending.popleft()
+            for next_chunk in itertools.islice(chunks, 1):
+                pending.append(
+                    (next_chunk, executor.submit(_hash_chunk, algorithm, next_chunk))
+                )
+            yield from zip(chunk, future.result())
+
+
+def count_duplicates(
+    root: str, algorithm: str, workers: int = 1, bloom: bool = False
+) -> int:
+    """Count files whose content hash is shared with at least one other file.
+
+    With bloom, only digests a Bloom filter has seen before are kept, which
+    saves memory on huge trees at the cost of a second pass.
+    """
+    if bloom:
+        # A metadata-only walk sizes the filter
+        num_files = sum(1 for _ in iter_files(root))
+        return _count_duplicates_bloom(root, num_files, algorithm, workers)
+
+    counts: dict[bytes, int] = {}
+    for _, digest in iter_digests(iter_files(root), algorithm, workers):
+        counts[digest] = counts.get(digest, 0) + 1
+    return sum(count for count in counts.values() if count > 1)
+
+
+def _count_duplicates_bloom(
+    root: str, num_files: int, algorithm: str, workers: int
+) -> int:
+    """Count duplicates keeping only digests the Bloom filter has seen before.
+
+    The first pass collects candidate digests, true duplicates plus a small
+    fraction of false positives, with their file sizes. The second pass walks
+    the tree again, rehashes only files of a candidate size and counts
+    candidate digests exactly.
+    """
+    bloom = BloomFilter(num_files, BLOOM_ERROR_RATE)
+    candidates: dict[bytes, int] = {}
+    for path, digest in iter_digests(iter_files(root), algorithm, workers):
+        if bloom.add(digest) and digest not in candidates:
+            candidates[digest] = os.path.getsize(path)
+    del bloom
+
+    sizes = set(candidates.values())
+    paths = (
+        entry.path
+        for entry in iter_entries(root)
+        if entry.stat(follow_symlinks=False).st_size in sizes
+    )
+    counts: dict[bytes, int] = {}
+    for _, digest in iter_digests(paths, algorithm, workers):
+        if digest in candidates:
+            counts[digest] = counts.get(digest, 0) + 1
+    return sum(count for count in counts.values() if count > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count files in duplicate groups")
+    parser.add_argument("algorithm", choices=ALGORITHMS, help="Hash algorithm")
+    parser.add_argument("path", help="Directory to scan")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Hashing processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--bloom",
+        action="store_true",
+        help="Filter digests through a Bloom filter to save memory on huge trees",
+    )
+    args = parser.parse_args()
+
+    print(count_duplicates(args.path, args.algorithm, args.workers, args.bloom))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 if TYPE_CHECKING:
-    from runner import MatrixResult
+    from collections.abc import Callable
+
+    from runner import BenchmarkResult, MatrixResult
 
 
 def plot_matrix_results(matrix_results: list[MatrixResult], output_dir: Path):
@@ -23,109 +32,132 @@ def plot_matrix_results(matrix_results: list[MatrixResult], output_dir: Path):
 
     profiles = list(dict.fromkeys(mr.profile for mr in matrix_results))
     dup_ratios = list(dict.fromkeys(mr.dup_ratio for mr in matrix_results))
-    colors = ["#2ecc71", "#3498db", "#e74c3c", "#9b59b6", "#f39c12"]
+    colors = [
+        "#2ecc71",
+        "#3498db",
+        "#e74c3c",
+        "#9b59b6",
+        "#f39c12",
+        "#1abc9c",
+        "#34495e",
+        "#7f8c8d",
+    ]
+    index = _index_results(matrix_results)
 
-    # Time by profile chart
-    _, axes = plt.subplots(len(profiles), 1, figsize=(12, 4 * len(profiles)), squeeze=False)
+    config_labels = [f"{mr.profile[:5]}\n{mr.dup_ratio:.0%}" for mr in matrix_results]
 
-    for i, profile in enumerate(profiles):
-        ax = axes[i, 0]
-        profile_results = [mr for mr in matrix_results if mr.profile == profile]
+    # Each chart builds its own Figure, so they can render concurrently;
+    # Agg releases the GIL while rasterizing and encoding the PNG.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            # Time by profile chart
+            executor.submit(
+                _plot_grouped_bars,
+                index, profiles, dup_ratios, tools, colors, _avg_time, "{:.2f}s", "Time (seconds)",
+                "Benchmark Results by Profile and Duplicate Ratio", output_dir / "matrix_by_profile.png",
+            ),
+            # Performance heatmap
+            executor.submit(_plot_heatmap, matrix_results, index, tools, config_labels, output_dir, "time"),
+            # Memory by profile chart
+            executor.submit(
+                _plot_grouped_bars,
+                index, profiles, dup_ratios, tools, colors, _max_memory, "{:.0f}", "Peak Memory (MB)",
+                "Memory Usage by Profile and Duplicate Ratio", output_dir / "matrix_memory_by_profile.png",
+            ),
+            # Memory heatmap
+            executor.submit(_plot_heatmap, matrix_results, index, tools, config_labels, output_dir, "memory"),
+        ]
+        for future in futures:
+            future.result()
 
-        x = np.arange(len(dup_ratios))
-        width = 0.8 / len(tools)
+    print(f"Saved matrix plots to {output_dir}/")
 
-        for j, tool in enumerate(tools):
-            times = []
-            for mr in profile_results:
-                tool_result = next((r for r in mr.results if r.tool == tool), None)
-                times.append(tool_result.avg_time if tool_result and not tool_result.error else 0)
 
-            offset = (j - len(tools) / 2 + 0.5) * width
-            bars = ax.bar(x + offset, times, width, label=tool, color=colors[j % len(colors)])
+def _index_results(matrix_results: list[MatrixResult]) -> dict[tuple[str, float, str], BenchmarkResult]:
+    """Map (profile, dup_ratio, tool) to the tool's result for that configuration."""
+    return {(mr.profile, mr.dup_ratio, r.tool): r for mr in matrix_results for r in mr.results}
 
-            for bar, t in zip(bars, times):
-                if t > 0:
-                    ax.annotate(f"{t:.2f}s", xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
-                               xytext=(0, 2), textcoords="offset points", ha="center", va="bottom", fontsize=8)
 
-        ax.set_ylabel("Time (seconds)")
-        ax.set_title(f"Profile: {profile}")
-        ax.set_xticks(x)
-        ax.set_xticklabels([f"{r:.0%}" for r in dup_ratios])
-        ax.set_xlabel("Duplicate Ratio")
-        ax.legend(loc="upper left")
+def _avg_time(result: BenchmarkResult | None) -> float | None:
+    """Average time of a successful result."""
+    if result and not result.error:
+        return result.avg_time
+    return None
 
-    plt.suptitle("Benchmark Results by Profile and Duplicate Ratio", fontsize=14, fontweight="bold")
-    plt.tight_layout()
-    plt.savefig(output_dir / "matrix_by_profile.png", dpi=150)
-    plt.close()
 
-    # Performance heatmap
-    config_labels = [f"{mr.profile[:5]}\n{mr.dup_ratio:.0%}" for mr in matrix_results]
-    _plot_heatmap(matrix_results, tools, config_labels, output_dir, "time")
+def _max_memory(result: BenchmarkResult | None) -> float | None:
+    """Peak memory of a successful result that recorded memory usage."""
+    if result and not result.error and result.memory_kb:
+        return result.max_memory_mb
+    return None
+
 
-    # Memory by profile chart
-    fig, axes = plt.subplots(len(profiles), 1, figsize=(12, 4 * len(profiles)), squeeze=False)
+def _plot_grouped_bars(
+    index: dict[tuple[str, float, str], BenchmarkResult],
+    profiles: list[str],
+    dup_ratios: list[float],
+    tools: list[str],
+    colors: list[str],
+    metric_fn: Callable[[BenchmarkResult | None], float | None],
+    label_fmt: str,
+    ylabel: str,
+    title: str,
+    output_path: Path,
+):
+    """Generate one bar chart per profile with a group of tool bars per dup ratio."""
+    fig = Figure(figsize=(12, 4 * len(profiles)))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(len(profiles), 1, squeeze=False)
 
     for i, profile in enumerate(profiles):
         ax = axes[i, 0]
-        profile_results = [mr for mr in matrix_results if mr.profile == profile]
 
         x = np.arange(len(dup_ratios))
         width = 0.8 / len(tools)
 
         for j, tool in enumerate(tools):
-            memory_values = []
-            for mr in profile_results:
-                tool_result = next((r for r in mr.results if r.tool == tool), None)
-                if tool_result and not tool_result.error and tool_result.memory_kb:
-                    memory_values.append(tool_result.max_memory_mb)
-                else:
-                    memory_values.append(0)
+            values = []
+            for dup_ratio in dup_ratios:
+                value = metric_fn(index.get((profile, dup_ratio, tool)))
+                values.append(value if value is not None else 0)
 
             offset = (j - len(tools) / 2 + 0.5) * width
-            bars = ax.bar(x + offset, memory_values, width, label=tool, color=colors[j % len(colors)])
+            bars = ax.bar(x + offset, values, width, label=tool, color=colors[j % len(colors)])
 
-            for bar, m in zip(bars, memory_values):
-                if m > 0:
-                    ax.annotate(f"{m:.0f}", xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
-                               xytext=(0, 2), textcoords="offset points", ha="center", va="bottom", fontsize=8)
+            ax.bar_label(bars, labels=[label_fmt.format(v) if v > 0 else "" for v in values], padding=2, fontsize=8)
 
-        ax.set_ylabel("Peak Memory (MB)")
+        ax.set_ylabel(ylabel)
         ax.set_title(f"Profile: {profile}")
         ax.set_xticks(x)
         ax.set_xticklabels([f"{r:.0%}" for r in dup_ratios])
         ax.set_xlabel("Duplicate Ratio")
         ax.legend(loc="upper left")
 
-    plt.suptitle("Memory Usage by Profile and Duplicate Ratio", fontsize=14, fontweight="bold")
-    plt.tight_layout()
-    plt.savefig(output_dir / "matrix_memory_by_profile.png", dpi=150)
-    plt.close()
-
-    # Memory heatmap
-    _plot_heatmap(matrix_results, tools, config_labels, output_dir, "memory")
-
-    print(f"Saved matrix plots to {output_dir}/")
+    fig.suptitle(title, fontsize=14, fontweight="bold")
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
 
 
-def _plot_heatmap(matrix_results: list[MatrixResult], tools: list[str], config_labels: list[str], output_dir: Path, metric: str):
+def _plot_heatmap(
+    matrix_results: list[MatrixResult],
+    index: dict[tuple[str, float, str], BenchmarkResult],
+    tools: list[str],
+    config_labels: list[str],
+    output_dir: Path,
+    metric: str,
+):
     """Generate heatmap for time or memory."""
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
 
+    metric_fn = _avg_time if metric == "time" else _max_memory
     data = []
     for tool in tools:
         row = []
         for mr in matrix_results:
-            tool_result = next((r for r in mr.results if r.tool == tool), None)
-            if metric == "time":
-                row.append(tool_result.avg_time if tool_result and not tool_result.error else float("nan"))
-            else:
-                if tool_result and not tool_result.error and tool_result.memory_kb:
-                    row.append(tool_result.max_memory_mb)
-                else:
-                    row.append(float("nan"))
+            value = metric_fn(index.get((mr.profile, mr.dup_ratio, tool)))
+            row.append(value if value is not None else float("nan"))
         data.append(row)
 
     data = np.array(data)
@@ -151,46 +183,80 @@ def _plot_heatmap(matrix_results: list[MatrixResult], tools: list[str], config_l
     title = "Performance Heatmap (green = faster)" if metric == "time" else "Memory Heatmap (green = less memory)"
     ax.set_title(title)
     label = "Relative Speed (1.0 = fastest)" if metric == "time" else "Relative Memory (1.0 = lowest)"
-    plt.colorbar(im, ax=ax, label=label)
-    plt.tight_layout()
+    fig.colorbar(im, ax=ax, label=label)
+    fig.tight_layout()
 
     filename = "matrix_heatmap.png" if metric == "time" else "matrix_memory_heatmap.png"
-    plt.savefig(output_dir / filename, dpi=150)
-    plt.close()
+    fig.savefig(output_dir / filename, dpi=150)
 
 
-def save_matrix_results(matrix_results: list[MatrixResult], output_path: Path):
-    """Save matrix results to JSON."""
-    data = {
-        "matrix": [
+def append_matrix_result(matrix_result: MatrixResult, output_path: Path):
+    """Append one matrix cell to a line-delimited JSON results file."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("ab") as f:
+        f.write(_dump_line(_matrix_cell(matrix_result)))
+
+
+def load_matrix_results(path: Path) -> list[MatrixResult]:
+    """Load matrix results written by append_matrix_result."""
+    from runner import BenchmarkResult, MatrixResult
+
+    matrix_results = []
+    with path.open("rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            cell = orjson.loads(line) if orjson is not None else json.loads(line)
+            results = [
+                BenchmarkResult(
+                    tool=r["tool"],
+                    times=r["times"],
+                    memory_kb=r["memory_kb"],
+                    duplicates_found=r["duplicates_found"],
+                    expected_duplicates=r["expected_duplicates"],
+                    error=r["error"],
+                )
+                for r in cell["results"]
+            ]
+            matrix_results.append(
+                MatrixResult(
+                    profile=cell["profile"],
+                    dup_ratio=cell["dup_ratio"],
+                    metadata=cell["metadata"],
+                    results=results,
+                )
+            )
+    return matrix_results
+
+
+def _matrix_cell(mr: MatrixResult) -> dict:
+    return {
+        "profile": mr.profile,
+        "dup_ratio": mr.dup_ratio,
+        "metadata": mr.metadata,
+        "results": [
             {
-                "profile": mr.profile,
-                "dup_ratio": mr.dup_ratio,
-                "metadata": mr.metadata,
-                "results": [
-                    {
-                        "tool": r.tool,
-                        "avg_time": r.avg_time,
-                        "min_time": r.min_time,
-                        "times": r.times,
-                        "memory_kb": r.memory_kb,
-                        "avg_memory_mb": r.avg_memory_mb,
-                        "max_memory_mb": r.max_memory_mb,
-                        "duplicates_found": r.duplicates_found,
-                        "expected_duplicates": r.expected_duplicates,
-                        "accuracy": r.accuracy,
-                        "error": r.error,
-                    }
-                    for r in mr.results
-                ],
+                "tool": r.tool,
+                "avg_time": r.avg_time,
+                "min_time": r.min_time,
+                "times": r.times,
+                "memory_kb": r.memory_kb,
+                "avg_memory_mb": r.avg_memory_mb,
+                "max_memory_mb": r.max_memory_mb,
+                "duplicates_found": r.duplicates_found,
+                "expected_duplicates": r.expected_duplicates,
+                "accuracy": r.accuracy,
+                "error": r.error,
             }
-            for mr in matrix_results
-        ]
+            for r in mr.results
+        ],
     }
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(json.dumps(data, indent=2))
-    print(f"Saved matrix results to {output_path}")
+
+def _dump_line(data: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return json.dumps(data, separators=(",", ":")).encode() + b"\n"
 
 
 def print_matrix_summary(matrix_results: list[MatrixResult]):
@@ -205,27 +271,26 @@ def print_matrix_summary(matrix_results: list[MatrixResult]):
             if r.tool not in tools:
                 tools.append(r.tool)
 
-    header = f"{'Config':<20}"
-    for tool in tools:
-        header += f"{tool:>12}"
-    print(header)
-    print("-" * 80)
-
-    for mr in matrix_results:
-        config = f"{mr.profile[:10]} {mr.dup_ratio:.0%}"
-        row = f"{config:<20}"
-        for tool in tools:
-            result = next((r for r in mr.results if r.tool == tool), None)
-            if result and not result.error:
-                row += f"{result.avg_time:>10.2f}s "
-            else:
-                row += f"{'N/A':>12}"
-        print(row)
+    index = _index_results(matrix_results)
+    _print_table(matrix_results, index, tools, _avg_time, "{:>10.2f}s ")
 
     print("\n" + "-" * 80)
     print("PEAK MEMORY (MB)")
     print("-" * 80)
 
+    _print_table(matrix_results, index, tools, _max_memory, "{:>10.1f}MB")
+
+    print("=" * 80)
+
+
+def _print_table(
+    matrix_results: list[MatrixResult],
+    index: dict[tuple[str, float, str], BenchmarkResult],
+    tools: list[str],
+    metric_fn: Callable[[BenchmarkResult | None], float | None],
+    value_fmt: str,
+):
+    """Print one row per matrix configuration with a metric column per tool."""
     header = f"{'Config':<20}"
     for tool in tools:
         header += f"{tool:>12}"
@@ -236,11 +301,6 @@ def print_matrix_summary(matrix_results: list[MatrixResult]):
         config = f"{mr.profile[:10]} {mr.dup_ratio:.0%}"
         row = f"{config:<20}"
         for tool in tools:
-            result = next((r for r in mr.results if r.tool == tool), None)
-            if result and not result.error and result.memory_kb:
-                row += f"{result.max_memory_mb:>10.1f}MB"
-            else:
-                row += f"{'N/A':>12}"
+            value = metric_fn(index.get((mr.profile, mr.dup_ratio, tool)))
+            row += value_fmt.format(value) if value is not None else f"{'N/A':>12}"
         print(row)
-
-    print("=" * 80)
@@ -1,16 +1,24 @@
 from __future__ import annotations
 
-import re
+import ctypes
+import errno
+import os
 import shutil
+import signal
 import subprocess
 import tempfile
+import threading
 import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import BinaryIO
 
 from config import MATRIX_DUP_RATIOS, MATRIX_PROFILES
 from generator import generate_dataset
-from tools import ALL_TOOLS, DedupTool
+from plotting import append_matrix_result
+from tools import ALL_TOOLS, DedupTool, HashCount, available_tools
 
 
 def drop_caches() -> bool:
@@ -66,21 +74,157 @@ class BenchmarkResult:
         return (self.duplicates_found / self.expected_duplicates) * 100
 
 
-def parse_time_output(stderr: str) -> int | None:
-    """Extract max RSS from /usr/bin/time -v output."""
-    match = re.search(r"Maximum resident set size \(kbytes\): (\d+)", stderr)
-    return int(match.group(1)) if match else None
+# prctl option that makes orphaned descendants reparent to the calling process
+PR_SET_CHILD_SUBREAPER = 36
 
+# Starts the appended command as a background job of a small shell. The job
+# reports its own PID on fd 3 before exec'ing the command, since the outer shell
+# could reap a quickly finished job if it ran anything after starting it.
+_LAUNCHER = [
+    "/bin/sh",
+    "-c",
+    '"$@" &',
+    "sh",
+    "/bin/sh",
+    "-c",
+    'echo $$ >&3; exec "$@" 3>&-',
+    "sh",
+]
 
-def strip_time_output(stderr: str) -> str:
-    """Remove /usr/bin/time output from stderr."""
-    lines = stderr.split("\n")
-    result = []
-    for line in lines:
-        if "Command being timed:" in line:
-            break
-        result.append(line)
-    return "\n".join(result)
+# How much of a tool's output is kept for debugging
+STDOUT_SAMPLE_SIZE = 2000
+STDERR_SAMPLE_SIZE = 1000
+
+
+@dataclass
+class MeasuredRun:
+    stderr: bytes
+    elapsed: float
+    memory_kb: int
+    # What read_stdout returned, if the command's stdout was streamed to it
+    stdout_result: object = None
+
+
+def _kill(pid: int) -> None:
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _set_child_subreaper(enabled: bool) -> bool:
+    """Toggle adopting orphaned descendants, returning False where unsupported."""
+    try:
+        prctl = ctypes.CDLL(None).prctl
+    except (OSError, AttributeError):
+        return False
+    return prctl(PR_SET_CHILD_SUBREAPER, int(enabled), 0, 0, 0) == 0
+
+
+def _spawn(cmd: list[str], file_actions: list[tuple]) -> int:
+    """Start cmd as a child process and return its PID.
+
+    posix_spawn runs the child on our memory until it execs, and the kernel
+    carries our peak RSS over into the child's ru_maxrss. Where possible the
+    command is forked from a small shell instead and adopted once the shell
+    exits, so its ru_maxrss covers only the command itself.
+    """
+    executable = shutil.which(cmd[0])
+    if executable is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cmd[0])
+    if not _set_child_subreaper(True):
+        return os.posix_spawn(executable, cmd, os.environ, file_actions=file_actions)
+
+    try:
+        read_fd, write_fd = os.pipe()
+        with open(read_fd, "rb") as pid_pipe:
+            try:
+                shell = os.posix_spawn(
+                    _LAUNCHER[0],
+                    [*_LAUNCHER, executable, *cmd[1:]],
+                    os.environ,
+                    file_actions=[*file_actions, (os.POSIX_SPAWN_DUP2, write_fd, 3)],
+                )
+            finally:
+                os.close(write_fd)
+            pid = int(pid_pipe.read())
+        os.waitpid(shell, 0)
+    finally:
+        _set_child_subreaper(False)
+    return pid
+
+
+def _read_pipe(read_stdout: Callable[[BinaryIO], object], fd: int) -> object:
+    with open(fd, "rb") as stdout:
+        try:
+            return read_stdout(stdout)
+        finally:
+            # Drain what the reader left so the command never blocks on a full pipe
+            while stdout.read(1024**2):
+                pass
+
+
+def run_measured(
+    cmd: list[str],
+    timeout: float,
+    read_stdout: Callable[[BinaryIO], object] | None = None,
+) -> MeasuredRun:
+    """Run a command, measuring wall time and peak RSS via wait4.
+
+    stdout is discarded, unless read_stdout is given, which then reads it from
+    a pipe in a thread while the command runs.
+    """
+    with tempfile.TemporaryFile() as err, ThreadPoolExecutor(max_workers=1) as reader:
+        stdout_future = None
+        write_fd = None
+        if read_stdout is None:
+            stdout_action = (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0)
+        else:
+            read_fd, write_fd = os.pipe()
+            stdout_action = (os.POSIX_SPAWN_DUP2, write_fd, 1)
+            stdout_future = reader.submit(_read_pipe, read_stdout, read_fd)
+
+        start = time.perf_counter()
+        try:
+            pid = _spawn(cmd, [stdout_action, (os.POSIX_SPAWN_DUP2, err.fileno(), 2)])
+        finally:
+            # Once only the command holds the write end, the reader sees EOF
+            # when it exits
+            if write_fd is not None:
+                os.close(write_fd)
+
+        timer = threading.Timer(timeout, _kill, (pid,))
+        timer.start()
+        try:
+            _, status, rusage = os.wait4(pid, 0)
+        except BaseException:
+            # As a background job the command ignores SIGINT, so stop it here
+            _kill(pid)
+            os.waitpid(pid, 0)
+            raise
+        finally:
+            timer.cancel()
+        elapsed = time.perf_counter() - start
+
+        if os.WIFSIGNALED(status) and elapsed >= timeout:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+        err.seek(0)
+        return MeasuredRun(
+            stderr=err.read(),
+            elapsed=elapsed,
+            # ru_maxrss is reported in kilobytes on Linux
+            memory_kb=rusage.ru_maxrss,
+            stdout_result=stdout_future.result() if stdout_future else None,
+        )
+
+
+def _sample_lines(stdout: BinaryIO, sample: bytearray, limit: int) -> Iterator[bytes]:
+    """Yield lines from stdout, copying the first limit bytes into sample."""
+    for line in stdout:
+        if len(sample) < limit:
+            sample += line[: limit - len(sample)]
+        yield line
 
 
 def run_benchmark(
@@ -89,43 +233,68 @@ def run_benchmark(
     runs: int,
     expected_duplicates: int | None = None,
     verbose: bool = False,
+    hash_workers: int | None = None,
 ) -> BenchmarkResult:
-    """Run a tool multiple times and collect timing data."""
+    """Run a tool multiple times and collect timing data.
+
+    hash_workers sets the worker processes of the hashcount.py baselines, None
+    keeps their default of one per CPU.
+    """
     result = BenchmarkResult(tool=tool.name, expected_duplicates=expected_duplicates)
 
     if not tool.is_available():
         result.error = "Tool not available"
         return result
 
-    cmd = tool.command(str(dataset_path))
-    time_cmd = ["/usr/bin/time", "-v"] + cmd
+    if isinstance(tool, HashCount):
+        cmd = tool.command(str(dataset_path), workers=hash_workers)
+    else:
+        cmd = tool.command(str(dataset_path))
     print(f"  Running {tool.name}... (cmd: {' '.join(cmd)})")
 
+    # The warmup run's output is parsed as the tool produces it, so the timed
+    # runs can discard theirs
     drop_caches()
     print("    Warmup run (discarded)...")
+    stdout_sample = bytearray()
     try:
-        subprocess.run(time_cmd, capture_output=True, text=True, timeout=600)
-    except (subprocess.TimeoutExpired, Exception):
-        pass
+        warmup = run_measured(
+            cmd,
+            timeout=600,
+            read_stdout=lambda stdout: tool.parse_stream(
+                _sample_lines(stdout, stdout_sample, STDOUT_SAMPLE_SIZE)
+            ),
+        )
+        result.duplicates_found = warmup.stdout_result
+        if result.duplicates_found is None:
+            # Some tools report the count on stderr
+            result.duplicates_found = tool.parse_output(b"", warmup.stderr)
+        if stdout_sample:
+            result.stdout_sample = stdout_sample.decode(errors="replace")
+        if warmup.stderr:
+            result.stderr_sample = warmup.stderr[:STDERR_SAMPLE_SIZE].decode(
+                errors="replace"
+            )
+    except subprocess.TimeoutExpired:
+        result.error = "Timeout"
+        return result
+    except Exception as e:
+        # Also covers parse_stream failing, which surfaces from run_measured
+        result.error = f"Warmup run failed: {e}"
+        print(f"    [ERROR] {result.error}")
+        return result
 
     for i in range(runs):
         drop_caches()
-        start = time.perf_counter()
         try:
-            proc = subprocess.run(time_cmd, capture_output=True, text=True, timeout=600)
-            elapsed = time.perf_counter() - start
+            proc = run_measured(cmd, timeout=600)
+            elapsed = proc.elapsed
             result.times.append(elapsed)
 
-            memory_kb = parse_time_output(proc.stderr)
+            memory_kb = proc.memory_kb
             if memory_kb:
                 result.memory_kb.append(memory_kb)
 
-            tool_stderr = strip_time_output(proc.stderr)
-            if i == 0:
-                result.duplicates_found = tool.parse_output(proc.stdout, tool_stderr)
-                result.stdout_sample = proc.stdout[:2000] if proc.stdout else None
-                result.stderr_sample = tool_stderr[:1000] if tool_stderr else None
-
             mem_str = f", {memory_kb / 1024:.1f} MB" if memory_kb else ""
             print(f"    Run {i + 1}/{runs}: {elapsed:.2f}s{mem_str}")
 
@@ -152,18 +321,14 @@ def run_all_benchmarks(
     dataset_path: Path,
     runs: int,
     expected_duplicates: int | None = None,
+    hash_workers: int | None = None,
 ) -> list[BenchmarkResult]:
     """Run all available tools."""
     results = []
 
-    available = []
-    unavailable = []
-    for tool_class in ALL_TOOLS:
-        tool = tool_class()
-        if tool.is_available():
-            available.append(tool)
-        else:
-            unavailable.append(tool.name)
+    available = available_tools()
+    available_names = {tool.name for tool in available}
+    unavailable = [tool.name for tool in ALL_TOOLS if tool.name not in available_names]
 
     if unavailable:
         print(f"Skipping unavailable tools: {', '.join(unavailable)}")
@@ -171,7 +336,9 @@ def run_all_benchmarks(
     print(f"Running: {', '.join(t.name for t in available)}\n")
 
     for tool in available:
-        result = run_benchmark(tool, dataset_path, runs, expected_duplicates)
+        result = run_benchmark(
+            tool, dataset_path, runs, expected_duplicates, hash_workers=hash_workers
+        )
         results.append(result)
 
     check_tool_results(results)
@@ -210,6 +377,16 @@ def check_tool_results(results: list[BenchmarkResult]) -> None:
     print()
 
 
+def tmpfs_dir(total_size: int) -> Path | None:
+    """Return /dev/shm if it is writable and can hold a dataset of total_size."""
+    shm = Path("/dev/shm")
+    if not shm.is_dir() or not os.access(shm, os.W_OK):
+        return None
+    if shutil.disk_usage(shm).free <= total_size * 2:
+        return None
+    return shm
+
+
 @dataclass
 class MatrixResult:
     profile: str
@@ -218,54 +395,111 @@ class MatrixResult:
     results: list[BenchmarkResult]
 
 
+def _prepare_cell(
+    profile: str,
+    dup_ratio: float,
+    total_size: int,
+    tmp_dir: Path | None,
+    progress: bool,
+) -> tuple[Path, dict]:
+    """Generate the dataset for one matrix cell in a fresh temp directory."""
+    temp_dir = Path(
+        tempfile.mkdtemp(
+            prefix=f"dedup_bench_{profile}_{int(dup_ratio * 100)}_", dir=tmp_dir
+        )
+    )
+    try:
+        metadata = generate_dataset(
+            output_dir=temp_dir / "demo_files",
+            total_size=total_size,
+            dup_ratio=dup_ratio,
+            profile_name=profile,
+            progress=progress,
+        )
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return temp_dir, metadata
+
+
 def run_matrix_benchmark(
     total_size: int,
     runs: int,
     profiles: list[str] | None = None,
     dup_ratios: list[float] | None = None,
+    tmp_dir: Path | None = None,
+    pipeline: bool = False,
+    results_path: Path | None = None,
+    hash_workers: int | None = None,
 ) -> list[MatrixResult]:
-    """Run benchmarks across all profile/dup_ratio combinations."""
+    """Run benchmarks across all profile/dup_ratio combinations.
+
+    Datasets are generated under tmp_dir, or the system temp directory if None.
+    With pipeline, the next cell's dataset is generated in the background while
+    the tools run on the current one. If results_path is given, it is truncated
+    and each cell is appended to it as soon as it finishes, so an interrupted
+    run keeps its completed cells. hash_workers is passed to run_benchmark.
+    """
     profiles = profiles or MATRIX_PROFILES
     dup_ratios = dup_ratios or MATRIX_DUP_RATIOS
+    cells = [(profile, dup_ratio) for profile in profiles for dup_ratio in dup_ratios]
 
     all_results: list[MatrixResult] = []
-    total_combinations = len(profiles) * len(dup_ratios)
-    current = 0
+    total_combinations = len(cells)
+    executor = ThreadPoolExecutor(max_workers=1) if pipeline else None
+    pending: Future[tuple[Path, dict]] | None = None
 
-    for profile in profiles:
-        for dup_ratio in dup_ratios:
-            current += 1
+    if results_path is not None:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        results_path.write_bytes(b"")
+
+    try:
+        for current, (profile, dup_ratio) in enumerate(cells, start=1):
             print(f"\n{'=' * 60}")
             print(
                 f"[{current}/{total_combinations}] Profile: {profile}, Dup ratio: {dup_ratio:.0%}"
             )
             print("=" * 60)
 
-            temp_dir = tempfile.mkdtemp(
-                prefix=f"dedup_bench_{profile}_{int(dup_ratio * 100)}_"
-            )
-            output_dir = Path(temp_dir) / "demo_files"
+            if executor is None:
+                temp_dir, metadata = _prepare_cell(
+                    profile, dup_ratio, total_size, tmp_dir, progress=True
+                )
+            else:
+                if pending is None:
+                    pending = executor.submit(
+                        _prepare_cell, profile, dup_ratio, total_size, tmp_dir, False
+                    )
+                temp_dir, metadata = pending.result()
+                pending = None
+                if current < total_combinations:
+                    pending = executor.submit(
+                        _prepare_cell, *cells[current], total_size, tmp_dir, False
+                    )
 
             try:
-                metadata = generate_dataset(
-                    output_dir=output_dir,
-                    total_size=total_size,
-                    dup_ratio=dup_ratio,
-                    profile_name=profile,
+                expected_dups = metadata.get("files_in_duplicate_groups")
+                results = run_all_benchmarks(
+                    temp_dir / "demo_files", runs, expected_dups, hash_workers
                 )
 
-                expected_dups = metadata.get("files_in_duplicate_groups")
-                results = run_all_benchmarks(output_dir, runs, expected_dups)
-
-                all_results.append(
-                    MatrixResult(
-                        profile=profile,
-                        dup_ratio=dup_ratio,
-                        metadata=metadata,
-                        results=results,
-                    )
+                matrix_result = MatrixResult(
+                    profile=profile,
+                    dup_ratio=dup_ratio,
+                    metadata=metadata,
+                    results=results,
                 )
+                all_results.append(matrix_result)
+                if results_path is not None:
+                    append_matrix_result(matrix_result, results_path)
             finally:
                 shutil.rmtree(temp_dir, ignore_errors=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+            # Clean up a dataset generated ahead for a cell that never ran
+            if pending is not None and not pending.cancelled():
+                if pending.exception() is None:
+                    shutil.rmtree(pending.result()[0], ignore_errors=True)
 
     return all_results
@@ -1,14 +1,38 @@
 from __future__ import annotations
 
+import functools
+import importlib.machinery
+import importlib.util
 import json
 import re
 import shutil
+import sys
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 if TYPE_CHECKING:
-    from typing import ClassVar
+    from collections.abc import Iterable
+    from typing import ClassVar, Final
+
+HASHCOUNT = Path(__file__).parent / "hashcount.py"
+
+# All the ways rdfind reports the duplicate count, scanned in a single pass
+_RDFIND_PATTERN = re.compile(
+    rb"(?P<duplicate>\d+)\s+duplicate"
+    rb"|Totally\s+(?P<totally>\d+)\s+files"
+    rb"|It seems like you have\s+(?P<not_unique>\d+)",
+    re.IGNORECASE,
+)
+
+# PATH lookups don't change during a benchmark session
+_which = functools.lru_cache(maxsize=None)(shutil.which)
 
 
 class DedupTool(ABC):
@@ -23,15 +47,20 @@ class DedupTool(ABC):
     def is_available(self) -> bool:
         return True
 
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
         return None
 
+    def parse_stream(self, stdout: Iterable[bytes]) -> int | None:
+        """Parse stdout line by line as the tool produces it."""
+        return self.parse_output(b"".join(stdout), b"")
+
 
 class Dedup(DedupTool):
     name = "dedup"
 
-    def _find_binary(self) -> str | None:
-        if shutil.which("dedup"):
+    @functools.cached_property
+    def binary(self) -> str | None:
+        if _which("dedup"):
             return "dedup"
         script_dir = Path(__file__).parent.parent
         binary = script_dir / "target" / "release" / "dedup"
@@ -40,17 +69,17 @@ class Dedup(DedupTool):
         return None
 
     def command(self, path: str) -> list[str]:
-        binary = self._find_binary()
-        if binary is None:
+        if self.binary is None:
             raise FileNotFoundError("dedup binary not found")
-        return [binary, path, "--no-progress", "-f", "json"]
+        return [self.binary, path, "--no-progress", "-f", "json"]
 
     def is_available(self) -> bool:
-        return self._find_binary() is not None
+        return self.binary is not None
 
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
         try:
-            data = json.loads(stdout)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            data = orjson.loads(stdout) if orjson is not None else json.loads(stdout)
             return data.get("stats", {}).get("duplicate_files", None)
         except (json.JSONDecodeError, KeyError):
             return None
@@ -58,80 +87,187 @@ class Dedup(DedupTool):
 
 class BashMd5(DedupTool):
     name = "bash+md5"
+    # Counts digests in a single awk pass instead of sort | uniq -c. md5sum
+    # prefixes the line with a backslash when it escapes the file name
+    _SCRIPT: ClassVar[str] = (
+        'find "$1" -type f -exec md5sum {} + | awk '
+        "'{h = $1; sub(/^\\\\/, \"\", h); c[h]++} "
+        "END {for (h in c) if (c[h] > 1) s += c[h]; print s + 0}'"
+    )
 
     def command(self, path: str) -> list[str]:
-        cmd = f"find '{path}' -type f -exec md5sum {{}} + | awk '{{print $1}}' | sort | uniq -c | awk '$1 > 1 {{sum += $1}} END {{print sum+0}}'"
-        return ["bash", "-c", cmd]
+        # The path is passed as an argument, so the shell never parses it
+        return ["bash", "-c", self._SCRIPT, "bash", path]
 
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
         try:
             return int(stdout.strip())
         except ValueError:
             return None
 
 
+class HashCount(DedupTool):
+    """Runs hashcount.py, which hashes files across worker processes.
+
+    Peak memory is measured for the largest single process, so it leaves out
+    the other workers and under-reports the total.
+    """
+
+    _PREFIX: ClassVar[tuple[str, ...]]
+    # Passed to hashcount.py as -j, None keeps its default of one per CPU
+    workers: ClassVar[int | None] = None
+
+    def command(self, path: str, workers: int | None = None) -> list[str]:
+        workers = self.workers if workers is None else workers
+        if workers is None:
+            return [*self._PREFIX, path]
+        return [*self._PREFIX, path, "-j", str(workers)]
+
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
+        try:
+            return int(stdout.strip())
+        except ValueError:
+            return None
+
+
+class BashMd5Fast(HashCount):
+    name = "python+md5"
+    _PREFIX = (sys.executable, str(HASHCOUNT), "md5")
+
+
+class BlakeHash(HashCount):
+    name = "python+blake3"
+    _PREFIX = (sys.executable, str(HASHCOUNT), "blake3")
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec("blake3") is not None
+
+
+class Xxh3Hash(HashCount):
+    """Stands in for BlakeHash when only xxhash is installed."""
+
+    name = "python+xxh3"
+    _PREFIX = (sys.executable, str(HASHCOUNT), "xxh3")
+
+    def is_available(self) -> bool:
+        return (
+            importlib.util.find_spec("blake3") is None
+            and importlib.util.find_spec("xxhash") is not None
+        )
+
+
+class FastCdcHash(HashCount):
+    """Hashes FastCDC chunks rather than whole files, to time the chunking pipeline."""
+
+    name = "fastcdc+blake3"
+    _PREFIX = (sys.executable, str(HASHCOUNT), "fastcdc")
+
+    def is_available(self) -> bool:
+        if importlib.util.find_spec("blake3") is None:
+            return False
+        # hashcount only uses the compiled FastCDC implementation. Looking it up
+        # by its dotted name would import fastcdc, or raise if it is missing
+        spec = importlib.util.find_spec("fastcdc")
+        return (
+            spec is not None
+            and importlib.machinery.PathFinder.find_spec(
+                "fastcdc_cy", spec.submodule_search_locations
+            )
+            is not None
+        )
+
+
 class Fdupes(DedupTool):
     name = "fdupes"
+    _PREFIX: ClassVar[tuple[str, ...]] = ("fdupes", "-rq")
 
     def command(self, path: str) -> list[str]:
-        return ["fdupes", "-rq", path]
+        return [*self._PREFIX, path]
 
     def is_available(self) -> bool:
-        return shutil.which("fdupes") is not None
+        return _which("fdupes") is not None
 
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
-        lines = [line for line in stdout.strip().split("\n") if line.strip()]
-        return len(lines) if lines else 0
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
+        # fdupes prints one path per line and separates groups with a single
+        # empty line, so the path count falls out of counting newlines
+        stdout = stdout.strip()
+        if not stdout:
+            return 0
+        return stdout.count(b"\n") + 1 - stdout.count(b"\n\n")
+
+    def parse_stream(self, stdout: Iterable[bytes]) -> int | None:
+        return sum(1 for line in stdout if line.strip())
 
 
 class Fclones(DedupTool):
     name = "fclones"
+    _PREFIX: ClassVar[tuple[str, ...]] = ("fclones", "group")
 
     def command(self, path: str) -> list[str]:
-        return ["fclones", "group", path]
+        return [*self._PREFIX, path]
 
     def is_available(self) -> bool:
-        return shutil.which("fclones") is not None
+        return _which("fclones") is not None
+
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
+        return self.parse_stream(stdout.splitlines())
 
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
-        count = 0
-        for line in stdout.strip().split("\n"):
-            line = line.strip()
-            if line and (line.startswith("/") or line.startswith(".")):
-                count += 1
-        return count
+    def parse_stream(self, stdout: Iterable[bytes]) -> int | None:
+        # fclones indents the paths under each group header
+        return sum(1 for line in stdout if line.lstrip().startswith((b"/", b".")))
 
 
 class Rdfind(DedupTool):
     name = "rdfind"
+    _PREFIX: ClassVar[tuple[str, ...]] = (
+        "rdfind",
+        "-dryrun",
+        "true",
+        "-outputname",
+        "/dev/null",
+    )
 
     def command(self, path: str) -> list[str]:
-        return [
-            "rdfind",
-            "-dryrun",
-            "true",
-            "-outputname",
-            "/dev/null",
-            path,
-        ]
+        return [*self._PREFIX, path]
 
     def is_available(self) -> bool:
-        return shutil.which("rdfind") is not None
-
-    def parse_output(self, stdout: str, stderr: str) -> int | None:
-        for pattern in [
-            r"(\d+)\s+duplicate",
-            r"Totally\s+(\d+)\s+files",
-            r"It seems like you have\s+(\d+)",
-        ]:
-            match = re.search(pattern, stdout, re.IGNORECASE)
-            if match:
-                return int(match.group(1))
-        for pattern in [r"(\d+)\s+duplicate"]:
-            match = re.search(pattern, stderr, re.IGNORECASE)
+        return _which("rdfind") is not None
+
+    def parse_output(self, stdout: bytes, stderr: bytes) -> int | None:
+        match = _RDFIND_PATTERN.search(stdout) or _RDFIND_PATTERN.search(stderr)
+        return _rdfind_count(match)
+
+    def parse_stream(self, stdout: Iterable[bytes]) -> int | None:
+        for line in stdout:
+            match = _RDFIND_PATTERN.search(line)
             if match:
-                return int(match.group(1))
+                return _rdfind_count(match)
         return None
 
 
-ALL_TOOLS: list[type[DedupTool]] = [Dedup, Fclones, Fdupes, Rdfind, BashMd5]
+def _rdfind_count(match: re.Match[bytes] | None) -> int | None:
+    if match is None:
+        return None
+    return int(next(group for group in match.groups() if group is not None))
+
+
+# One shared instance per tool, so cached state such as Dedup.binary is
+# resolved once per session
+ALL_TOOLS: Final[tuple[DedupTool, ...]] = (
+    Dedup(),
+    Fclones(),
+    Fdupes(),
+    Rdfind(),
+    BashMd5(),
+    BashMd5Fast(),
+    BlakeHash(),
+    Xxh3Hash(),
+    FastCdcHash(),
+)
+
+
+def available_tools() -> list[DedupTool]:
+    """Return the available tools, probing them concurrently."""
+    with ThreadPoolExecutor(max_workers=len(ALL_TOOLS)) as executor:
+        available = list(executor.map(lambda tool: tool.is_available(), ALL_TOOLS))
+    return [tool for tool, ok in zip(ALL_TOOLS, available) if ok]